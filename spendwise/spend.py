@@ -1,256 +1,648 @@
 import os
+import re
+import sys
+import json
+import time
+import logging
+import queue
+import atexit
+import signal
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import pyaudio
+import numpy as np
 import mysql.connector
+from mysql.connector import pooling
 from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
 import speech_recognition as sr
 
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
 
 ###database connection and setup
+POOL_NAME = "spendwise"
+POOL_SIZE = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Create the shared MySQL connection pool on first use."""
+    global _pool
+    #checked again under the lock: the constructor opens every pooled connection,
+    #so threads racing on a cold start must not each build their own pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=POOL_SIZE,
+                    host=os.getenv("DB_HOST"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    database=os.getenv("DB_NAME"),
+                    #every statement commits on its own, so no snapshot or row lock outlives it;
+                    #each write below is a single statement (executemany() becomes one INSERT)
+                    autocommit=True,
+                    #the C extension is several times faster at protocol handling than pure Python
+                    use_pure=not mysql.connector.HAVE_CEXT
+                )
+                if not mysql.connector.HAVE_CEXT:
+                    log.warning("mysql.connector C extension unavailable; using the pure Python driver.")
+                log.info("Database connection pool established successfully!")
+    return _pool
+
 def connect_to_db():
-    """connect to MySQL Database"""
+    """Borrow a connection from the pool; close() hands it back."""
     try:
-        db = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME")
-        )
-        print("Database conection established successfully!")
-        return db
+        return get_pool().get_connection()
     except mysql.connector.Error as err:
-        print(f"Error: {err}")
+        log.error("Could not connect to the database: %s", err)
         return None
 
+#statements are kept as constants so every call sends byte-identical SQL
+INSERT_EXPENSE_SQL = """
+    INSERT INTO expenses (user_id, description, amount, date)
+    VALUES (%s, %s, %s, %s)
+"""
+INSERT_SUMMARY_SQL = """
+    INSERT INTO summaries (user_id, period_type, total_amount, start_date, end_date)
+    SELECT %s, %s, COALESCE(SUM(amount), 0), %s, %s FROM expenses
+    WHERE user_id = %s AND date >= %s AND date < DATE_ADD(%s, INTERVAL 1 DAY)
+"""
+INSERT_STOCK_SQL = """
+    INSERT INTO stockdata (name, performance, timestamp)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE performance = VALUES(performance)
+"""
+SELECT_LATEST_STOCK_SQL = """
+    SELECT MAX(timestamp) FROM stockdata WHERE name = %s
+"""
+
+#bump whenever setup_tables() gains a table, column or index
+SCHEMA_VERSION = 3
+
+_schema_ready = False
+
+
+def _index_exists(cursor, table, index):
+    """MySQL has no CREATE INDEX IF NOT EXISTS, so look the index up instead."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s;
+    """, (table, index))
+    return bool(cursor.fetchall())
+
+def _schema_version(cursor):
+    """Return the recorded schema version, or 0 when none has been recorded yet."""
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version;")
+        return cursor.fetchall()[0][0] or 0
+    except mysql.connector.Error:
+        return 0
+
 def setup_tables():
     """Create necessary tables in the database."""
+    global _schema_ready
+    if _schema_ready:
+        return
+
     db = connect_to_db()
     if not db:
         return
 
-    cursor = db.cursor()
+    #closing() returns the connection to the pool even if a step raises
+    with closing(db), closing(db.cursor()) as cursor:
+        #a single lookup is enough when the schema is already current
+        if _schema_version(cursor) >= SCHEMA_VERSION:
+            _schema_ready = True
+            return
 
-    try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(255),
-                email VARCHAR(255) UNIQUE
-            );
-        """)
-    except mysql.connector.Error as err:
-        print(f"Database error while creating users table: {err}")
+        schema_ok = True
 
-    try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS expenses (
-                expense_id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                description VARCHAR(255),
-                amount DECIMAL(10, 2),
-                date DATETIME
-            );
-        """)
-    except mysql.connector.Error as err:
-        print(f"Database error while creating Expenses table: {err}")
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INT AUTO_INCREMENT PRIMARY KEY,
+                    name VARCHAR(255),
+                    email VARCHAR(255) UNIQUE
+                );
+            """)
+        except mysql.connector.Error as err:
+            schema_ok = False
+            log.error("Database error while creating users table: %s", err)
 
-    try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS summaries (
-                summary_id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                period_type ENUM('daily', 'weekly', 'monthly'),
-                total_amount DECIMAL(10, 2),
-                start_date DATE,
-                end_date DATE,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            );
-        """)
-    except mysql.connector.Error as err:
-        print(f"Database error while creating summaries table: {err}")
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS expenses (
+                    expense_id INT AUTO_INCREMENT PRIMARY KEY,
+                    user_id INT,
+                    description VARCHAR(255),
+                    amount DECIMAL(10, 2),
+                    date DATETIME
+                );
+            """)
+        except mysql.connector.Error as err:
+            schema_ok = False
+            log.error("Database error while creating Expenses table: %s", err)
 
-    try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stockdata (
-                stock_id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(255),
-                performance DECIMAL(10, 2),
-                timestamp DATE
-            );
-        """)
-    except mysql.connector.Error as err:
-        print(f"Database error while creating stockdata table: {err}")
+        try:
+            #covering index: the summary totals are read from the index alone, without table rows
+            if not _index_exists(cursor, "expenses", "idx_user_date_amount"):
+                cursor.execute("CREATE INDEX idx_user_date_amount ON expenses (user_id, date, amount);")
+            #superseded by the covering index above
+            if _index_exists(cursor, "expenses", "idx_expenses_user_date"):
+                cursor.execute("DROP INDEX idx_expenses_user_date ON expenses;")
+        except mysql.connector.Error as err:
+            schema_ok = False
+            log.error("Database error while indexing Expenses table: %s", err)
 
-    db.commit()
-    cursor.close()
-    db.close()
-    print("Database tables created successfully!")
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    summary_id INT AUTO_INCREMENT PRIMARY KEY,
+                    user_id INT,
+                    period_type ENUM('daily', 'weekly', 'monthly'),
+                    total_amount DECIMAL(10, 2),
+                    start_date DATE,
+                    end_date DATE,
+                    FOREIGN KEY (user_id) REFERENCES users(user_id)
+                );
+            """)
+        except mysql.connector.Error as err:
+            schema_ok = False
+            log.error("Database error while creating summaries table: %s", err)
 
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS stockdata (
+                    stock_id INT AUTO_INCREMENT PRIMARY KEY,
+                    name VARCHAR(255),
+                    performance DECIMAL(10, 2),
+                    timestamp DATE
+                );
+            """)
+        except mysql.connector.Error as err:
+            schema_ok = False
+            log.error("Database error while creating stockdata table: %s", err)
+
+        try:
+            #one row per symbol and day, so re-fetching a day updates it instead of duplicating it
+            if not _index_exists(cursor, "stockdata", "uq_stock_name_timestamp"):
+                #drop duplicates left by earlier re-runs, keeping the first copy of each day
+                cursor.execute("""
+                    DELETE newer FROM stockdata newer
+                    JOIN stockdata older
+                        ON newer.name = older.name
+                        AND newer.timestamp = older.timestamp
+                        AND newer.stock_id > older.stock_id;
+                """)
+                cursor.execute("ALTER TABLE stockdata ADD UNIQUE KEY uq_stock_name_timestamp (name, timestamp);")
+            #superseded by the unique key above
+            if _index_exists(cursor, "stockdata", "idx_stock_name_timestamp"):
+                cursor.execute("DROP INDEX idx_stock_name_timestamp ON stockdata;")
+        except mysql.connector.Error as err:
+            schema_ok = False
+            log.error("Database error while indexing stockdata table: %s", err)
+
+        #only record the version once every step succeeded, so failures are retried
+        if schema_ok:
+            try:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INT NOT NULL
+                    );
+                """)
+                cursor.execute("INSERT INTO schema_version (version) VALUES (%s);", (SCHEMA_VERSION,))
+                _schema_ready = True
+            except mysql.connector.Error as err:
+                log.error("Database error while recording schema version: %s", err)
 
-#initialize the database setup
-setup_tables()
+        db.commit()
+    log.info("Database tables created successfully!")
 
 
 #parsing logic
+#an optional $, digits (grouped with commas or not), optional decimals, and a dangling period;
+#the lookarounds make it a whole token, so "mp3" or "1,2345" never yield an amount
+AMOUNT_RE = re.compile(r"(?<![\w.,$])\$?((?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?)\.?(?![\d,]*\w)")
+
+
 def parse_expense_details(text):
-    words = text.split()
-    amount = None
-    description = None
+    #the first number (optionally prefixed with $) is the amount
+    match = AMOUNT_RE.search(text)
+    if not match:
+        raise ValueError("could not parse expense details from the text.")
+    amount = float(match.group(1).replace(",", ""))
 
-    #extract the first number as amount
-    for word in words:
-        try:
-            amount = float(word)
-            break
-        except ValueError:
-            continue
-    if amount:
-        #assuming the rest of the sentence is the description
-        description_start = words.index(word) + 1
-        description = " ".join(words[description_start:])
+    #the rest of the sentence, around the amount, is the description
+    description = " ".join((text[:match.start()] + " " + text[match.end():]).split())
 
     if not amount or not description:
         raise ValueError("could not parse expense details from the text.")
-    
+
     return description, amount
 
-#voice-to-text for expense logging
-def log_expense_from_voice(user_id):
-    recognizer = sr.Recognizer()
+###background expense writer
+EXPENSE_BATCH_SIZE = 32
+EXPENSE_BATCH_WINDOW = 0.5  # seconds
+
+#(user_id, description, amount, date) rows waiting to be written
+INSERT_Q = queue.Queue()
+
+_writer = None
+_writer_lock = threading.Lock()
 
+
+def _write_expenses(rows):
+    """Insert a batch of queued expenses in one statement."""
+    db = connect_to_db()
+    if not db:
+        log.error("Dropped %d expense(s): no database connection.", len(rows))
+        return
     try:
-        with sr.Microphone() as source:
+        with closing(db), closing(db.cursor(buffered=False)) as cursor:
+            cursor.executemany(INSERT_EXPENSE_SQL, rows)
+    except mysql.connector.Error as err:
+        log.error("Database error while logging expenses: %s", err)
+
+def _expense_writer():
+    """Drain INSERT_Q, writing whatever arrives within one batch window together."""
+    while True:
+        rows = [INSERT_Q.get()]
+        deadline = time.monotonic() + EXPENSE_BATCH_WINDOW
+        while len(rows) < EXPENSE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(INSERT_Q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_expenses(rows)
+        except Exception:
+            #keep the writer alive, or later expenses are never drained and flush_expenses() hangs
+            log.exception("Unexpected error while logging %d expense(s)", len(rows))
+        finally:
+            for _ in rows:
+                INSERT_Q.task_done()
+
+def queue_expense(user_id, description, amount):
+    """Hand an expense to the background writer and return immediately."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_expense_writer, name="expense-writer", daemon=True)
+            _writer.start()
+            atexit.register(flush_expenses)
+    #stamp the time now rather than when the batch reaches MySQL
+    INSERT_Q.put((user_id, description, amount, datetime.now()))
+
+def flush_expenses():
+    """Block until every queued expense has been written."""
+    INSERT_Q.join()
+
+
+#voice-to-text for expense logging
+USE_LOCAL_STT = os.getenv("USE_LOCAL_STT", "1") != "0"
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "model-small-en")
+
+#silence that ends a phrase; the library default of 0.8s adds noticeable lag
+PAUSE_THRESHOLD = 0.5
+AMBIENT_NOISE_DURATION = 0.3
+
+RECOGNIZER = sr.Recognizer()
+RECOGNIZER.pause_threshold = PAUSE_THRESHOLD
+
+_vosk_model = None
+_microphone = None
+_microphone_lock = threading.Lock()
+
+
+def _get_vosk_model():
+    """Load the local speech model once; None when local STT is unavailable."""
+    global _vosk_model
+    if _vosk_model is None and USE_LOCAL_STT and vosk and os.path.isdir(VOSK_MODEL_PATH):
+        _vosk_model = vosk.Model(VOSK_MODEL_PATH)
+    return _vosk_model
+
+def _get_microphone():
+    """Open the microphone once and keep it open; callers must hold _microphone_lock."""
+    global _microphone
+    if _microphone is None:
+        microphone = sr.Microphone()
+        microphone.__enter__()
+        atexit.register(microphone.__exit__, None, None, None)
+        _microphone = microphone
+        #calibrate once rather than on every phrase
+        RECOGNIZER.adjust_for_ambient_noise(_microphone, duration=AMBIENT_NOISE_DURATION)
+    return _microphone
+
+def _capture_phrase(recognizer, chunks):
+    """Record the next phrase, queueing each audio buffer as soon as it is heard."""
+    try:
+        with _microphone_lock:
+            source = _get_microphone()
             print("Listening for expense details...")
-            audio = recognizer.listen(source)
+            for chunk in recognizer.listen(source, stream=True):
+                chunks.put(chunk)
+    finally:
+        chunks.put(None)
+
+def _drain(chunks):
+    """Yield queued audio chunks until the capture thread signals the end of the phrase."""
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            return
+        yield chunk
+
+def _transcribe_locally(model, chunks):
+    """Feed each audio chunk to Vosk as it arrives, so decoding overlaps recording."""
+    rec = None
+    for chunk in chunks:
+        #decode at the microphone's native rate; resampling each chunk on its own
+        #would put a discontinuity at every chunk boundary
+        if rec is None:
+            rec = vosk.KaldiRecognizer(model, chunk.sample_rate)
+        rec.AcceptWaveform(chunk.get_raw_data(convert_width=2))
+    if rec is None:
+        raise ValueError("no audio was captured.")
+
+    text = json.loads(rec.FinalResult()).get("text", "")
+    if not text:
+        raise sr.UnknownValueError()
+    return text
+
+def transcribe(recognizer, chunks):
+    """Turn a stream of audio chunks into text, locally when a Vosk model is available."""
+    model = _get_vosk_model()
+    if model is not None:
+        return _transcribe_locally(model, chunks)
+
+    frames = []
+    sample_rate = sample_width = None
+    for chunk in chunks:
+        frames.append(chunk.frame_data)
+        sample_rate, sample_width = chunk.sample_rate, chunk.sample_width
+    if not frames:
+        raise ValueError("no audio was captured.")
+
+    #the Google Web Speech API only accepts a complete utterance
+    audio = sr.AudioData(b"".join(frames), sample_rate, sample_width)
+    return recognizer.recognize_google(audio)
 
-        text = recognizer.recognize_google(audio)
-        print(f"Recognized text: {text}")
+def log_expense_from_voice(user_id):
+    chunks = queue.Queue()
+
+    try:
+        #capture on a background thread while transcription consumes the chunks
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            capture = executor.submit(_capture_phrase, RECOGNIZER, chunks)
+            try:
+                text = transcribe(RECOGNIZER, _drain(chunks))
+            finally:
+                #surface microphone errors ahead of "no audio" errors
+                capture.result()
+        log.info("Recognized text: %s", text)
 
         description, amount = parse_expense_details(text)
 
-        db = connect_to_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            INSERT INTO expenses (user_id, description, amount, date)
-            VALUES (%s, %s, %s, NOW());
-        """, (user_id, description, amount))
-        db.commit()
+        #the insert happens on the writer thread so the user is not kept waiting on MySQL
+        queue_expense(user_id, description, amount)
 
-        print(f"Logged expense: {description} - ${amount}")
+        print(f"Queued expense: {description} - ${amount}")
     except Exception as e:
-        print(f"Error recognizing or logging expense: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if db:
-            db.close()
+        log.error("Error recognizing or logging expense: %s", e)
 
 ###generate summaries
-def generate_summary(user_id, period='daily'):
+def period_ranges(today=None):
+    """Map each summary period to its (start_date, end_date) as ISO date strings."""
+    today = today or datetime.today().date()
+    end_date = today.isoformat()
+    return {
+        'daily': (end_date, end_date),
+        'weekly': ((today - timedelta(days=7)).isoformat(), end_date),
+        'monthly': ((today - timedelta(days=30)).isoformat(), end_date),
+    }
+
+def generate_summary(user_id, period='daily', start_date=None, end_date=None):
     ###generate a summary of expenses over a specified period (daily)###
+    #callers summarising several periods pass ranges resolved once via period_ranges()
+    if start_date is None or end_date is None:
+        start_date, end_date = period_ranges()[period]
+
     db = connect_to_db()
-    cursor = db.cursor()
-
-    #set date range based on the period type
-    today = datetime.today().date()
-    if period == 'daily':
-        start_date, end_date = today, today
-    elif period == 'weekly':
-        start_date, end_date = today - timedelta(days=7), today
-    elif period == 'monthly':
-        start_date, end_date = today - timedelta(days=30), today
-
-    #calculate total expenses within the date range
-    try:
-        
-        cursor.execute("""
-            SELECT SUM(amount) FROM Expenses
-            WHERE user_id = %s AND date BETWEEN %s AND %s;
-        """, (user_id, start_date, end_date))
-        total_amount = cursor.fetchone()[0] or 0.0
-    except mysql.connector.Error as err:
-        print(f"Database error while fetching expenses: {err}")
-        total_amount = 0.0
+    if not db:
+        return
 
     try:
-        # Insert summary into the summaries table
-        cursor.execute("""
-            INSERT INTO summaries (user_id, period_type, total_amount, start_date, end_date)
-            VALUES (%s, %s, %s, %s, %s);
-        """, (user_id, period, total_amount, start_date, end_date))
-        db.commit()
+        with closing(db), closing(db.cursor()) as cursor:
+            # Total the expenses and insert the summary in a single server-side statement
+            cursor.execute(INSERT_SUMMARY_SQL, (
+                user_id, period, start_date, end_date,
+                user_id, start_date, end_date
+            ))
     except mysql.connector.Error as err:
-        print(f"Database error while inserting summary: {err}")
+        log.error("Database error while generating summary: %s", err)
 
 ###fetch stock market data
-def fetch_stock_data():
-    """Fetch top-performing stock data from Alpha Vantage and store it in the stockdata table."""
-    db = connect_to_db()
-    cursor = None
-    if db:
-        cursor = db.cursor()
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "YOUR_API_KEY")
+STOCK_SYMBOLS = ("AAPL", "IBM", "MSFT")
+REQUEST_TIMEOUT = (3, 10)  # (connect, read) seconds
+
+#one keep-alive session so repeated fetches reuse the TLS connection
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+#the daily series barely changes within a trading day, so responses are kept on disk
+CACHE_DIR = os.path.expanduser(os.getenv("SPENDWISE_CACHE_DIR", "~/.cache/spendwise"))
+CACHE_TTL = 3 * 60 * 60  # seconds
 
-    try:
-        # API details
-        api_key = "YOUR_API_KEY"
-        base_url = "https://www.alphavantage.co/query"
-        params = {
-            "function": "TIME_SERIES_DAILY",
-            "symbol": "APPL",  # Replace with the desired stock symbol
-            "apikey": api_key
-        }
-        
-        # Make the API request
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Process and store stock data
-        if "Time Series (Daily)" in data:
-            stock_data = data["Time Series (Daily)"]
-            for date, details in stock_data.items():
-                try:
-                    # Extract and calculate stock performance
-                    open_price = float(details["1. open"])
-                    close_price = float(details["4. close"])
-                    performance = close_price - open_price
-
-                    # Insert into the database
-                    cursor.execute("""
-                        INSERT INTO stockdata (name, performance, timestamp)
-                        VALUES (%s, %s, %s);
-                    """, ("IBM", performance, date))
-                    db.commit()
-                except mysql.connector.Error as err:
-                    print(f"Database error while inserting stock data for {date}: {err}")
-            print("Stock data fetched and stored successfully!")
-        else:
-            print("Unexpected response format:", data)
 
+def _fetch_daily_series(params):
+    """Return the raw Alpha Vantage response body, from the disk cache while it is fresh."""
+    #one file per symbol, overwritten on refresh; freshness is judged by its mtime alone
+    path = os.path.join(CACHE_DIR, f"{params['symbol']}.json")
+    try:
+        if time.time() - os.path.getmtime(path) < CACHE_TTL:
+            with open(path, "rb") as f:
+                return f.read()
+    except OSError:
+        pass
+
+    response = SESSION.get(ALPHA_VANTAGE_URL, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    content = response.content
+
+    #rate-limit notes and error messages also come back as 200s; never cache those
+    if b'"Time Series (Daily)"' in content:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+        except OSError as err:
+            log.warning("Could not cache stock data: %s", err)
+    return content
+
+def _latest_stock_dates(symbols):
+    """Map each symbol to the most recent day stored for it; symbols without rows are left out."""
+    db = connect_to_db()
+    if not db:
+        return {}
+    latest = {}
+    #one prepared cursor repeats the same statement, so it is prepared once for all symbols
+    with closing(db), closing(db.cursor(prepared=True)) as cursor:
+        for symbol in symbols:
+            cursor.execute(SELECT_LATEST_STOCK_SQL, (symbol,))
+            day = cursor.fetchall()[0][0]
+            if day is not None:
+                latest[symbol] = day
+    return latest
+
+def _parse_json(content):
+    """Decode a JSON body, with orjson when it is installed."""
+    return orjson.loads(content) if orjson else json.loads(content)
+
+def _fetch_symbol_rows(symbol, latest=None):
+    """Fetch one symbol's daily series and turn it into stockdata rows."""
+    params = {
+        "function": "TIME_SERIES_DAILY",
+        "symbol": symbol,
+        "outputsize": "compact",
+        "apikey": ALPHA_VANTAGE_API_KEY
+    }
+
+    # Make the API request (or reuse a recent response)
+    try:
+        data = _parse_json(_fetch_daily_series(params))
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching stock data: {e}")
+        log.error("Error fetching stock data for %s: %s", symbol, e)
+        return []
+    except ValueError as e:
+        #a 200 whose body is not JSON (orjson and json decode errors are ValueErrors)
+        log.error("Could not decode stock data for %s: %s", symbol, e)
+        return []
+
+    if "Time Series (Daily)" not in data:
+        log.warning("Unexpected response format for %s: %s", symbol, data)
+        return []
+    stock_data = data["Time Series (Daily)"]
+
+    # Days before the latest stored one are unchanged; the latest is re-sent
+    # in case it was stored mid-session
+    since = latest.isoformat() if latest else ""
+    items = [(date, details) for date, details in stock_data.items() if date >= since]
+
+    # Extract and calculate stock performance for every day in one vectorised step;
+    # a malformed day drops only this symbol, never the other symbols' rows
+    try:
+        opens = np.fromiter(
+            (float(details["1. open"]) for _, details in items),
+            dtype=np.float64, count=len(items)
+        )
+        closes = np.fromiter(
+            (float(details["4. close"]) for _, details in items),
+            dtype=np.float64, count=len(items)
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        log.error("Malformed stock data for %s: %s", symbol, e)
+        return []
+    performance = (closes - opens).tolist()
+    return [
+        (symbol, change, date)
+        for (date, _), change in zip(items, performance)
+    ]
+
+def fetch_stock_data(symbols=STOCK_SYMBOLS):
+    """Fetch top-performing stock data from Alpha Vantage and store it in the stockdata table."""
+    try:
+        if not symbols:
+            return
+
+        # Each symbol only needs the days from its latest stored one onward; today's
+        # row is always refreshed, and the disk cache already limits API calls
+        latest = _latest_stock_dates(symbols)
+
+        # Fire the requests concurrently so the wall time is that of the slowest one
+        with ThreadPoolExecutor(max_workers=len(symbols)) as executor:
+            batches = list(executor.map(
+                lambda symbol: _fetch_symbol_rows(symbol, latest.get(symbol)), symbols
+            ))
+        rows = [row for batch in batches for row in batch]
+        if not rows:
+            return
+
+        # Only borrow a pooled connection once there is something to write
+        db = connect_to_db()
+        if not db:
+            return
+
+        # Insert every symbol's days as one multi-row statement, which commits (and
+        # syncs the log) once; a plain cursor is kept here because executemany()
+        # on a prepared cursor sends one row per round trip
+        with closing(db), closing(db.cursor(buffered=False)) as cursor:
+            try:
+                cursor.executemany(INSERT_STOCK_SQL, rows)
+                log.info("Stock data fetched and stored successfully!")
+            except mysql.connector.Error as err:
+                log.error("Database error while inserting stock data: %s", err)
+
     except Exception as general_error:
-        print(f"An unexpected error occurred: {general_error}")
-    finally:
-        if cursor:
-            cursor.close()
-        if db:
-            db.close()
+        log.exception("An unexpected error occurred: %s", general_error)
+
+def _exit_on_sigterm(signum, frame):
+    #raise SystemExit so atexit handlers, including the expense flush, still run
+    sys.exit(0)
 
 
 ###main execution example
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("SPENDWISE_LOG", "WARNING").upper())
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
     #example setup for a single user (to be replaced with actual user management)
     user_id = 1  #assumed to exist in the database
 
+    #create the tables explicitly rather than on every import
+    setup_tables()
+    if "--migrate" in sys.argv[1:]:
+        sys.exit(0)
+
     #log an expense by voice
     log_expense_from_voice(user_id)
 
-    #generate expense summaries
-    generate_summary(user_id, period='daily')
-    generate_summary(user_id, period='weekly')
-    generate_summary(user_id, period='monthly')
-
-    #fetch and update stock market data
-    fetch_stock_data()
\ No newline at end of file
+    #the summaries below must see the expense just logged
+    flush_expenses()
+
+    #generate expense summaries and update stock market data concurrently;
+    #each task borrows its own pooled connection
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tasks = [
+            executor.submit(generate_summary, user_id, period, start_date, end_date)
+            for period, (start_date, end_date) in period_ranges().items()
+        ]
+        tasks.append(executor.submit(fetch_stock_data))
+        for task in tasks:
+            task.result()